@@ -1,17 +1,44 @@
 import sqlite3
+import json
 import datetime
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict, Literal
+from typing import List, Dict, Literal, Tuple
 
 # 상태를 나타내는 타입 정의
 IndexStatus = Literal["indexed", "not_indexed", "outdated", "indexing", "failed"] # Add "failed"
 
+# 폴더 상태 UPSERT 쿼리 (단건/일괄 쓰기에서 공통으로 사용)
+UPSERT_FOLDER_STATUS_SQL = """
+    INSERT INTO indexed_folders (provider_id, folder_path, last_indexed_at, status, file_count)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(provider_id, folder_path) DO UPDATE SET
+        last_indexed_at = excluded.last_indexed_at,
+        status = excluded.status,
+        file_count = excluded.file_count
+"""
+
+# 폴더 하위 파일 지문 조건 (루트이면 전체, 아니면 폴더 자신 또는 '폴더/'로 시작하는 경로)
+# substr 비교는 LIKE와 달리 대소문자를 구분하고 와일드카드 이스케이프가 필요 없음
+FINGERPRINTS_UNDER_FOLDER_SQL = "provider_id = ? AND (? OR file_path = ? OR substr(file_path, 1, length(?)) = ?)"
+
+def _folder_match_params(provider_id: str, folder_path: str) -> Tuple:
+    """FINGERPRINTS_UNDER_FOLDER_SQL에 전달할 파라미터를 만듭니다."""
+    folder = folder_path.rstrip('/')
+    prefix = folder + '/' # '/s/docs' 삭제 시 '/s/docs2'가 포함되지 않도록 구분자까지 비교
+    return (provider_id, folder in ('', '.'), folder, prefix, prefix)
+
 class IndexManager:
     def __init__(self, db_path: str = "index_metadata.db"):
         self.db_path = Path(db_path)
-        self.conn = None
+        self.conn = None # 쓰기 전용 연결 (모든 변경 작업은 이 연결 하나로 처리)
+        self._local = threading.local() # 스레드별 읽기 전용 연결
+        self._read_conns: List[sqlite3.Connection] = []
+        self._read_conns_lock = threading.Lock()
         self._connect()
         self._create_table()
+        self._migrate_last_indexed_at()
         self._cleanup_stale_indexing_statuses() # Call cleanup on startup
 
     def _connect(self):
@@ -19,10 +46,41 @@ class IndexManager:
         try:
             self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
             self.conn.row_factory = sqlite3.Row
+            self._apply_pragmas(self.conn)
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
             raise
 
+    def _read_conn(self) -> sqlite3.Connection:
+        """
+        현재 스레드의 읽기 전용 연결을 반환합니다. 없으면 새로 엽니다.
+        WAL 모드에서 읽기 연결은 쓰기 연결의 트랜잭션을 기다리지 않습니다.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._apply_pragmas(conn)
+            conn.execute("PRAGMA query_only=1")
+            self._local.conn = conn
+            with self._read_conns_lock:
+                self._read_conns.append(conn)
+        return conn
+
+    @staticmethod
+    def _apply_pragmas(conn: sqlite3.Connection):
+        """
+        쓰기 지연을 줄이기 위한 PRAGMA를 설정합니다.
+        WAL 모드에서는 상태 조회(읽기)가 인덱싱 작업(쓰기)을 막지 않습니다.
+        """
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL") # WAL에서는 NORMAL로도 손상 위험 없음
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536") # 음수는 KiB 단위 (약 64MB)
+        conn.execute("PRAGMA mmap_size=268435456") # 256MB
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA wal_autocheckpoint=1000") # 약 1000페이지마다 자동 체크포인트
+
     def _create_table(self):
         """'indexed_folders' 테이블이 없으면 생성합니다."""
         try:
@@ -32,15 +90,49 @@ class IndexManager:
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         provider_id TEXT NOT NULL,
                         folder_path TEXT NOT NULL,
-                        last_indexed_at TIMESTAMP,
+                        last_indexed_at INTEGER, -- Unix epoch (초)
                         status TEXT NOT NULL,
                         file_count INTEGER DEFAULT 0,
                         UNIQUE(provider_id, folder_path)
                     )
                 """)
+                # 변경되지 않은 파일의 재인덱싱을 건너뛰기 위한 파일 지문 테이블
+                self.conn.execute("""
+                    CREATE TABLE IF NOT EXISTS file_fingerprints (
+                        provider_id TEXT NOT NULL,
+                        file_path TEXT NOT NULL,
+                        size INTEGER,
+                        mtime REAL,
+                        sha256 TEXT,
+                        chunk_count INTEGER DEFAULT 0,
+                        PRIMARY KEY(provider_id, file_path)
+                    )
+                """)
+                # 재시작 시 'indexing' 상태 정리를 위한 부분 인덱스
+                self.conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_folders_provider_status
+                    ON indexed_folders(provider_id) WHERE status = 'indexing'
+                """)
         except sqlite3.Error as e:
             print(f"Error creating table: {e}")
 
+    def _migrate_last_indexed_at(self):
+        """
+        이전 버전에서 ISO 문자열로 저장된 last_indexed_at 값을 Unix epoch 정수로 변환합니다.
+        """
+        try:
+            with self.conn:
+                rows = self.conn.execute("""
+                    SELECT id, last_indexed_at FROM indexed_folders WHERE typeof(last_indexed_at) = 'text'
+                """).fetchall()
+                if rows:
+                    print(f"Migrating {len(rows)} 'last_indexed_at' values to epoch seconds.")
+                    self.conn.executemany("""
+                        UPDATE indexed_folders SET last_indexed_at = ? WHERE id = ?
+                    """, [(int(datetime.datetime.fromisoformat(row['last_indexed_at']).timestamp()), row['id']) for row in rows])
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error migrating last_indexed_at values: {e}")
+
     def _cleanup_stale_indexing_statuses(self):
         """
         서버 재시작 시 남아있는 'indexing' 상태를 'failed'로 변경합니다.
@@ -48,40 +140,52 @@ class IndexManager:
         try:
             with self.conn:
                 cursor = self.conn.execute("""
-                    SELECT provider_id, folder_path FROM indexed_folders WHERE status = 'indexing'
+                    UPDATE indexed_folders SET status = 'failed' WHERE status = 'indexing'
                 """)
-                stale_folders = cursor.fetchall()
-                
-                if stale_folders:
-                    print(f"Found {len(stale_folders)} stale 'indexing' statuses. Resetting to 'failed'.")
-                    for folder in stale_folders:
-                        self.conn.execute("""
-                            UPDATE indexed_folders SET status = 'failed' WHERE provider_id = ? AND folder_path = ?
-                        """, (folder['provider_id'], folder['folder_path']))
-                    self.conn.commit()
+            if cursor.rowcount:
+                print(f"Found {cursor.rowcount} stale 'indexing' statuses. Reset to 'failed'.")
         except sqlite3.Error as e:
             print(f"Error cleaning up stale indexing statuses: {e}")
 
     def set_folder_status(self, provider_id: str, folder_path: str, status: str, file_count: int = 0):
         """폴더의 인덱싱 상태를 설정하거나 업데이트합니다."""
-        now = datetime.datetime.now()
+        now = int(time.time())
         try:
             with self.conn:
-                self.conn.execute("""
-                    INSERT INTO indexed_folders (provider_id, folder_path, last_indexed_at, status, file_count)
-                    VALUES (?, ?, ?, ?, ?)
-                    ON CONFLICT(provider_id, folder_path) DO UPDATE SET
-                        last_indexed_at = excluded.last_indexed_at,
-                        status = excluded.status,
-                        file_count = excluded.file_count
-                """, (provider_id, folder_path, now, status, file_count))
+                self.conn.execute(UPSERT_FOLDER_STATUS_SQL, (provider_id, folder_path, now, status, file_count))
         except sqlite3.Error as e:
             print(f"Error setting folder status: {e}")
 
+    def set_folder_statuses_bulk(self, provider_id: str, rows: List[Tuple[str, str, int]]):
+        """
+        한 Provider의 여러 폴더 상태를 하나의 트랜잭션으로 설정합니다.
+
+        :param rows: (folder_path, status, file_count) 튜플의 리스트
+        """
+        self.set_folder_statuses_many([(provider_id, *row) for row in rows])
+
+    def set_folder_statuses_many(self, rows: List[Tuple[str, str, str, int]]):
+        """
+        여러 폴더의 상태를 executemany로 한 번에 설정합니다.
+
+        :param rows: (provider_id, folder_path, status, file_count) 튜플의 리스트
+        """
+        if not rows:
+            return
+        now = int(time.time())
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    UPSERT_FOLDER_STATUS_SQL,
+                    [(provider_id, folder_path, now, status, file_count) for provider_id, folder_path, status, file_count in rows]
+                )
+        except sqlite3.Error as e:
+            print(f"Error setting folder statuses: {e}")
+
     def get_folder_status(self, provider_id: str, folder_path: str) -> Dict | None:
         """특정 폴더의 상태 정보를 가져옵니다."""
         try:
-            cursor = self.conn.cursor()
+            cursor = self._read_conn().cursor()
             cursor.execute("""
                 SELECT * FROM indexed_folders WHERE provider_id = ? AND folder_path = ?
             """, (provider_id, folder_path))
@@ -91,35 +195,97 @@ class IndexManager:
             print(f"Error getting folder status: {e}")
             return None
 
-    def get_multiple_folder_statuses(self, provider_id: str, folder_paths: List[str]) -> Dict[str, Dict]:
-        """여러 폴더의 상태 정보를 한 번에 가져옵니다."""
+    def get_multiple_folder_statuses(self, provider_id: str, folder_paths: List[str]) -> Dict[str, sqlite3.Row]:
+        """
+        여러 폴더의 상태 정보를 한 번에 가져옵니다.
+        dict 변환 없이 sqlite3.Row를 그대로 반환하므로 row['status']처럼 이름으로 접근합니다.
+        """
         if not folder_paths:
             return {}
         
-        placeholders = ','.join('?' for _ in folder_paths)
-        query = f"SELECT * FROM indexed_folders WHERE provider_id = ? AND folder_path IN ({placeholders})"
-        
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(query, [provider_id] + folder_paths)
+            # 경로 목록을 JSON 배열 하나로 전달하여 목록 길이와 관계없이 같은 SQL(캐시된 statement)을 사용
+            cursor = self._read_conn().cursor()
+            cursor.execute("""
+                SELECT * FROM indexed_folders
+                WHERE provider_id = ? AND folder_path IN (SELECT value FROM json_each(?))
+            """, (provider_id, json.dumps(folder_paths)))
             rows = cursor.fetchall()
-            return {row['folder_path']: dict(row) for row in rows}
+            return {row['folder_path']: row for row in rows}
         except sqlite3.Error as e:
             print(f"Error getting multiple folder statuses: {e}")
             return {}
 
+    def get_fingerprints(self, provider_id: str, folder_path: str) -> Dict[str, sqlite3.Row]:
+        """폴더 하위에 저장된 파일 지문을 file_path를 키로 하여 가져옵니다."""
+        try:
+            cursor = self._read_conn().execute(
+                f"SELECT * FROM file_fingerprints WHERE {FINGERPRINTS_UNDER_FOLDER_SQL}",
+                _folder_match_params(provider_id, folder_path)
+            )
+            return {row['file_path']: row for row in cursor.fetchall()}
+        except sqlite3.Error as e:
+            print(f"Error getting file fingerprints: {e}")
+            return {}
+
+    def set_fingerprints(self, provider_id: str, rows: List[Tuple[str, int, float, str, int]]):
+        """
+        여러 파일의 지문을 하나의 트랜잭션으로 저장합니다.
+
+        :param rows: (file_path, size, mtime, sha256, chunk_count) 튜플의 리스트
+        """
+        if not rows:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany("""
+                    INSERT INTO file_fingerprints (provider_id, file_path, size, mtime, sha256, chunk_count)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(provider_id, file_path) DO UPDATE SET
+                        size = excluded.size,
+                        mtime = excluded.mtime,
+                        sha256 = excluded.sha256,
+                        chunk_count = excluded.chunk_count
+                """, [(provider_id, *row) for row in rows])
+        except sqlite3.Error as e:
+            print(f"Error setting file fingerprints: {e}")
+
+    def clear_fingerprints(self):
+        """모든 파일 지문을 삭제합니다. 벡터 DB를 초기화할 때 함께 호출해야 합니다."""
+        try:
+            with self.conn:
+                self.conn.execute("DELETE FROM file_fingerprints")
+        except sqlite3.Error as e:
+            print(f"Error clearing file fingerprints: {e}")
+
     def remove_folder(self, provider_id: str, folder_path: str):
-        """폴더의 인덱싱 정보를 삭제합니다."""
+        """폴더의 인덱싱 정보와 하위 파일 지문을 삭제합니다."""
         try:
             with self.conn:
                 self.conn.execute("""
                     DELETE FROM indexed_folders WHERE provider_id = ? AND folder_path = ?
                 """, (provider_id, folder_path))
+                self.conn.execute(
+                    f"DELETE FROM file_fingerprints WHERE {FINGERPRINTS_UNDER_FOLDER_SQL}",
+                    _folder_match_params(provider_id, folder_path)
+                )
         except sqlite3.Error as e:
             print(f"Error removing folder: {e}")
 
+    def checkpoint(self):
+        """WAL 내용을 DB 파일에 반영하고 WAL 파일을 비웁니다."""
+        try:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            print(f"Error checkpointing WAL: {e}")
+
     def close(self):
         """데이터베이스 연결을 닫습니다."""
+        with self._read_conns_lock:
+            for conn in self._read_conns:
+                conn.close()
+            self._read_conns.clear()
+        self._local = threading.local()
         if self.conn:
             self.conn.close()
             self.conn = None
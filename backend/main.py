@@ -1,13 +1,14 @@
 import os
 import uuid
+import asyncio
+import functools
 import hashlib
-import datetime
+import logging
 from fastapi import FastAPI, HTTPException, Depends, Header, Request, BackgroundTasks, UploadFile, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, List
-from pathlib import Path
+from typing import Optional, Dict, List, AsyncGenerator, Tuple
 from langchain_text_splitters import RecursiveCharacterTextSplitter # New import
 
 # Provider 관련 모듈 import
@@ -17,6 +18,12 @@ from .providers.synology import SynologyAPIProvider
 from .search_service import SearchService
 from .index_manager import index_manager, IndexManager
 
+# Provider/SearchService는 logging을 사용하므로, 기존 print 출력처럼 INFO 이상을 표시
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+# httpx/httpcore는 INFO에서 요청 URL을 기록하는데, Synology API URL에는 세션 ID(_sid)가 포함되므로 WARNING 이상만 표시
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("httpcore").setLevel(logging.WARNING)
+
 # --- Pydantic 모델 정의 ---
 class LoginRequest(BaseModel):
     host: str
@@ -84,22 +91,96 @@ async def get_provider_and_id(
         raise HTTPException(status_code=401, detail="Invalid or expired session token")
     return req.app.state.default_provider, req.app.state.default_provider.provider_id
 
+@functools.lru_cache(maxsize=1024)
+def _provider_id(host: str, username: str) -> str:
+    """
+    호스트와 사용자 이름으로 provider_id를 만듭니다. 같은 계정의 재로그인은 캐시된 값을 사용합니다.
+    기존 인덱스 상태와 연결되어야 하므로 해시 알고리즘(SHA-256)은 바꾸지 않습니다.
+    """
+    return hashlib.sha256(f"{host}:{username}".encode()).hexdigest()
+
 # --- 텍스트 분할 (Chunking) 헬퍼 ---
-def chunk_text(text: str, chunk_size: int = 750, chunk_overlap: int = 75):
-    """텍스트를 중첩되는 청크로 분할합니다."""
-    if not text:
-        return []
-    
-    text_splitter = RecursiveCharacterTextSplitter(
+CHUNK_SIZE = 750
+CHUNK_OVERLAP = 75
+
+@functools.lru_cache(maxsize=8)
+def _get_text_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """설정별 분할기를 한 번만 생성하여 재사용합니다."""
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len,
         separators=["\n\n", "\n", " ", ""] # Prioritize splitting by paragraphs, then lines, then words, then characters
     )
-    chunks = text_splitter.split_text(text)
-    return chunks
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    """텍스트를 중첩되는 청크로 분할합니다."""
+    if not text:
+        return []
+    return _get_text_splitter(chunk_size, chunk_overlap).split_text(text)
+
+def _last_chunk_start(text: str, chunks: List[str], chunk_overlap: int = CHUNK_OVERLAP) -> int:
+    """
+    마지막 청크가 원본 텍스트에서 시작하는 위치를 찾습니다.
+    청크를 앞에서부터 순서대로 찾으므로(TextSplitter의 start_index 계산과 동일) 반복되는 내용이 있어도 위치가 어긋나지 않습니다.
+    """
+    index = 0
+    previous_chunk_len = 0
+    for chunk in chunks:
+        index = text.find(chunk, max(0, index + previous_chunk_len - chunk_overlap))
+        previous_chunk_len = len(chunk)
+    return index
+
+def _hash_and_split_block(hasher, carry: str, block: str) -> Tuple[List[str], str]:
+    """
+    스트리밍으로 읽은 텍스트 블록을 해시에 반영하고 청크로 분할합니다.
+    carry는 이전 블록에서 아직 청크로 확정하지 않은 원본 텍스트입니다.
+
+    :return: (확정된 청크 목록, 다음 블록 앞에 이어 붙일 원본 텍스트)
+    """
+    hasher.update(block.encode('utf-8', errors='surrogatepass'))
+    text = carry + block
+    chunks = chunk_text(text)
+    if not chunks:
+        return [], text[-2:] # 공백뿐인 텍스트는 다음 블록과의 경계(구분자)만 유지
+
+    # 분할기는 청크 앞뒤 공백을 제거하므로, 마지막 청크를 그대로 carry로 쓰면 블록 경계의 공백/줄바꿈이 사라져
+    # 단어가 붙어 버림. 마지막 청크의 원본 위치(앞쪽 구분자 포함)부터 블록 끝까지를 그대로 넘김
+    start = _last_chunk_start(text, chunks)
+    while start > 0 and text[start - 1].isspace():
+        start -= 1
+    return chunks[:-1], text[start:]
+
+async def iter_text_chunks(provider: FileSystemProvider, path: str, hasher) -> AsyncGenerator[str, None]:
+    """
+    파일을 블록 단위로 읽으면서 청크를 생성합니다. 원본 텍스트는 한 블록씩만 메모리에 올라갑니다.
+    각 블록의 마지막 청크는 원본 텍스트 그대로 다음 블록과 이어 붙여 다시 분할하므로 청크 경계가 유지됩니다.
+    """
+    carry = ""
+    async for block in provider.iter_text(path):
+        if not block:
+            continue
+        # 텍스트 분할은 CPU 작업이므로 스레드 풀에서 실행
+        chunks, carry = await asyncio.to_thread(_hash_and_split_block, hasher, carry, block)
+        for chunk in chunks:
+            yield chunk
+    for chunk in chunk_text(carry):
+        yield chunk
 
 # --- 백그라운드 인덱싱 작업 ---
+
+TEXT_EXTENSIONS = frozenset(['txt', 'md', 'py', 'js', 'ts', 'json', 'csv']) # 점(.) 없이 소문자로
+
+def _is_text_file(name: str) -> bool:
+    """인덱싱 대상 텍스트 파일인지 확장자로 판단합니다. (파일마다 Path 객체를 만들지 않음)"""
+    stem, dot, extension = name.rpartition('.')
+    # '.bashrc'처럼 점으로 시작하는 이름은 확장자가 없는 것으로 처리 (Path.suffix와 동일)
+    return bool(dot and stem) and extension.lower() in TEXT_EXTENSIONS
+
+INDEX_BATCH_SIZE = 512 # index_chunks 한 번에 보낼 최대 청크 수
+INDEX_CONCURRENCY = 8 # 동시에 읽고 청킹할 최대 파일 수
+INDEX_QUEUE_SIZE = INDEX_BATCH_SIZE # 읽기 작업자와 임베딩 사이에서 대기할 수 있는 최대 청크 수
+
 async def do_index_folder(provider: FileSystemProvider, provider_id: str, folder_path: str, search_service: SearchService, index_manager: IndexManager):
     """지정된 폴더를 재귀적으로 탐색하며 파일을 인덱싱하는 백그라운드 작업"""
     if not provider_id:
@@ -110,52 +191,150 @@ async def do_index_folder(provider: FileSystemProvider, provider_id: str, folder
     total_chunks_indexed = 0
     
     try:
-        # Provider를 통해 재귀적으로 파일 목록 가져오기
-        all_items = await provider.list_files_recursive(folder_path)
-        
-        # 텍스트 기반 파일 필터링
-        text_extensions = ['.txt', '.md', '.py', '.js', '.ts', '.json', '.csv']
-        files_to_index = [
-            item for item in all_items 
-            if not item.is_directory and Path(item.name).suffix in text_extensions
-        ]
-
-        # 각 파일을 순회하며 청킹 및 인덱싱
-        for file_item in files_to_index:
+        # Provider를 통해 재귀적으로 텍스트 기반 파일 목록 가져오기 (탐색 중에 필터링)
+        files_to_index = await provider.list_files_recursive(folder_path, name_filter=_is_text_file)
+
+        # 크기와 수정 시간이 이전 인덱싱 때와 같은 파일은 건너뜀
+        fingerprints = index_manager.get_fingerprints(provider_id, folder_path)
+        changed_files = []
+        for item in files_to_index:
+            fingerprint = fingerprints.get(item.path)
+            if fingerprint and fingerprint['size'] == item.size and fingerprint['mtime'] == item.last_modified:
+                total_chunks_indexed += fingerprint['chunk_count']
+            else:
+                changed_files.append(item)
+        if len(changed_files) < len(files_to_index):
+            print(f"Skipping {len(files_to_index) - len(changed_files)} unchanged files in '{folder_path}'.")
+
+        # 여러 파일의 청크를 모아서 일정 크기마다 한 번에 인덱싱
+        documents: List[str] = []
+        metadatas: List[Dict] = []
+        ids: List[str] = []
+        pending_fingerprints: List[tuple] = [] # 모든 청크가 버퍼에 들어간 파일의 지문
+        indexed_fingerprints: List[tuple] = [] # 인덱싱이 완료된 파일 지문
+        failed_paths = set() # 청크 일부가 인덱싱에 실패한 파일 (지문을 저장하지 않아 다음에 다시 인덱싱)
+
+        async def flush_chunks():
+            nonlocal total_chunks_indexed
+            if not documents:
+                return
+            batch = (documents[:], metadatas[:], ids[:])
+            batch_fingerprints = pending_fingerprints[:]
+            documents.clear()
+            metadatas.clear()
+            ids.clear()
+            pending_fingerprints.clear()
             try:
-                print(f"Attempting to read content for: {file_item.path}") # Added print
-                content = await provider.read_file_content(file_item.path)
-                if not content:
-                    print(f"Warning: read_file_content returned None for {file_item.path}. Skipping indexing.") # Added print
-                    continue
-
-                # 텍스트를 청크로 분할
-                chunks = chunk_text(content)
-                if not chunks:
-                    continue
-
-                # ChromaDB에 저장할 데이터 준비
-                documents = []
-                metadatas = []
-                ids = []
-                for i, chunk in enumerate(chunks):
+                await search_service.index_chunks(documents=batch[0], metadatas=batch[1], ids=batch[2])
+            except Exception:
+                failed_paths.update(metadata['file_path'] for metadata in batch[1])
+                raise
+            total_chunks_indexed += len(batch[0])
+            indexed_fingerprints.extend(fp for fp in batch_fingerprints if fp[0] not in failed_paths)
+
+        # 작업자 -> 소비자 메시지
+        #   ("chunk", file_item, chunk_number, chunk): 인덱싱할 청크
+        #   ("done", file_item, digest, chunk_count): 파일의 모든 청크를 보냄
+        #   ("unchanged", file_item, digest): 내용이 이전과 같아 임베딩을 건너뜀
+        #   ("error", file_item): 읽기 실패
+        # 큐 크기가 청크 수로 제한되므로, 임베딩(소비자)이 느리면 작업자가 멈추고 메모리 사용량이 청크 단위로 제한됨
+        results: asyncio.Queue = asyncio.Queue(maxsize=INDEX_QUEUE_SIZE)
+
+        async def process_file(file_item: FileItem):
+            print(f"Attempting to read content for: {file_item.path}") # Added print
+            hasher = hashlib.sha256()
+            fingerprint = fingerprints.get(file_item.path)
+            chunk_count = 0
+            try:
+                file_chunks = iter_text_chunks(provider, file_item.path, hasher)
+                if fingerprint and fingerprint['size'] == file_item.size:
+                    # 크기가 같고 수정 시간만 바뀐 파일은 내용이 같을 수 있으므로, 해시를 확정할 때까지 청크를 모아 둠
+                    chunks = [chunk async for chunk in file_chunks]
+                    digest = hasher.hexdigest()
+                    if chunks and fingerprint['sha256'] == digest:
+                        await results.put(("unchanged", file_item, digest))
+                        return
+                    for chunk in chunks:
+                        chunk_count += 1
+                        await results.put(("chunk", file_item, chunk_count, chunk))
+                else:
+                    # 새 파일이나 크기가 바뀐 파일은 내용이 반드시 바뀌었으므로 청크를 읽는 대로 바로 보냄
+                    async for chunk in file_chunks:
+                        chunk_count += 1
+                        await results.put(("chunk", file_item, chunk_count, chunk))
+            except Exception as e:
+                print(f"Error reading file {file_item.path}: {e}")
+                await results.put(("error", file_item))
+                return
+            if not chunk_count:
+                print(f"Warning: no text content read for {file_item.path}. Skipping indexing.") # Added print
+            await results.put(("done", file_item, hasher.hexdigest(), chunk_count))
+
+        # 파일 읽기와 청킹은 INDEX_CONCURRENCY개의 작업자가 동시에 처리
+        pending_files = iter(changed_files) # 작업자들이 공유하는 파일 목록
+
+        async def worker():
+            for file_item in pending_files:
+                await process_file(file_item)
+
+        # 작업이 취소되면 각 await 지점에서 CancelledError가 발생하고, finally에서 작업자도 함께 취소됨
+        workers = [asyncio.create_task(worker()) for _ in range(min(INDEX_CONCURRENCY, len(changed_files)))]
+        try:
+            remaining_files = len(changed_files)
+            while remaining_files:
+                message = await results.get()
+                kind, file_item = message[0], message[1]
+                if kind == "chunk":
+                    _, _, chunk_number, chunk = message
+                    # ChromaDB에 저장할 데이터 준비
                     documents.append(chunk)
-                    metadatas.append({"file_path": file_item.path, "chunk_number": i + 1})
-                    ids.append(f"{file_item.path}-chunk-{i+1}")
-                
-                # SearchService를 통해 청크들을 일괄 인덱싱
-                await search_service.index_chunks(documents=documents, metadatas=metadatas, ids=ids)
-                total_chunks_indexed += len(chunks)
+                    metadatas.append({"file_path": file_item.path, "chunk_number": chunk_number})
+                    ids.append(f"{file_item.path}-chunk-{chunk_number}")
+
+                    # 버퍼가 가득 차면 SearchService를 통해 일괄 인덱싱
+                    if len(documents) >= INDEX_BATCH_SIZE:
+                        try:
+                            await flush_chunks()
+                        except Exception as e:
+                            print(f"Error indexing chunks: {e}")
+                    continue
 
-            except Exception as e:
-                print(f"Error reading or indexing file {file_item.path}: {e}")
+                remaining_files -= 1
+                if kind == "unchanged":
+                    chunk_count = fingerprints[file_item.path]['chunk_count']
+                    total_chunks_indexed += chunk_count
+                    indexed_fingerprints.append((file_item.path, file_item.size, file_item.last_modified, message[2], chunk_count))
+                elif kind == "done" and message[3]:
+                    _, _, digest, chunk_count = message
+                    # 다시 인덱싱한 파일의 청크 수가 줄었으면, upsert로 덮어써지지 않는 뒤쪽 청크를 삭제
+                    fingerprint = fingerprints.get(file_item.path)
+                    if fingerprint and fingerprint['chunk_count'] > chunk_count:
+                        await search_service.delete_chunks([
+                            f"{file_item.path}-chunk-{i}" for i in range(chunk_count + 1, fingerprint['chunk_count'] + 1)
+                        ])
+                    pending_fingerprints.append((file_item.path, file_item.size, file_item.last_modified, digest, chunk_count))
+
+            # 남은 청크 인덱싱
+            await flush_chunks()
+        finally:
+            for task in workers:
+                task.cancel()
+            # 중단되더라도 이미 인덱싱된 파일의 지문은 저장
+            index_manager.set_fingerprints(provider_id, indexed_fingerprints)
 
         index_manager.set_folder_status(provider_id, folder_path, "indexed", file_count=total_chunks_indexed)
         print(f"Successfully indexed {total_chunks_indexed} chunks from {len(files_to_index)} files in '{folder_path}'.")
 
+    except asyncio.CancelledError:
+        print(f"Indexing of folder '{folder_path}' was cancelled.")
+        index_manager.set_folder_status(provider_id, folder_path, "failed")
+        raise
     except Exception as e:
         print(f"Failed to index folder '{folder_path}': {e}")
         index_manager.set_folder_status(provider_id, folder_path, "failed")
+    finally:
+        # 긴 인덱싱 작업 동안 커진 WAL 파일을 정리
+        index_manager.checkpoint()
 
 
 # --- API 엔드포인트 ---
@@ -218,8 +397,7 @@ async def delete_file_or_folder(
 async def login(login_data: LoginRequest, request: Request):
     try:
         # 호스트와 사용자 이름을 기반으로 안정적인 provider_id 생성
-        stable_id_source = f"{login_data.host}:{login_data.username}"
-        provider_id = hashlib.sha256(stable_id_source.encode()).hexdigest()
+        provider_id = _provider_id(login_data.host, login_data.username)
 
         provider = SynologyAPIProvider(
             host=login_data.host, port=str(login_data.port),
@@ -240,10 +418,7 @@ async def login(login_data: LoginRequest, request: Request):
 async def list_files(path: str = ".", provider_info: tuple = Depends(get_provider_and_id)):
     provider, _ = provider_info
     try:
-        if isinstance(provider, SynologyAPIProvider) and path in ('/', '.'):
-            items = await provider.list_shares()
-        else:
-            items = await provider.list_files(path)
+        items = await provider.list_files(path)
         return {"path": path, "items": items}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An internal server error occurred: {e}")
@@ -282,7 +457,7 @@ async def get_folder_statuses(req: FolderStatusRequest, provider_info: tuple = D
 
     for path in req.folder_paths:
         db_status = db_statuses.get(path)
-        if not db_status:
+        if db_status is None:
             final_statuses[path] = "not_indexed"
         elif db_status['status'] != 'indexed':
             final_statuses[path] = db_status['status']
@@ -291,10 +466,8 @@ async def get_folder_statuses(req: FolderStatusRequest, provider_info: tuple = D
                 # 폴더의 마지막 수정 시간 확인 (Provider에 기능 필요)
                 folder_meta = await provider.get_metadata(path)
                 if folder_meta:
-                    last_modified = datetime.datetime.fromtimestamp(folder_meta.last_modified)
-                    last_indexed = datetime.datetime.fromisoformat(db_status['last_indexed_at'])
-                    
-                    if last_modified > last_indexed:
+                    # last_indexed_at은 Unix epoch 정수로 저장되므로 그대로 비교
+                    if folder_meta.last_modified > db_status['last_indexed_at']:
                         final_statuses[path] = "outdated"
                     else:
                         final_statuses[path] = "indexed"
@@ -381,5 +554,6 @@ async def reset_vector_db(req: Request):
     """디버깅용: ChromaDB 컬렉션을 완전히 초기화합니다."""
     search_service: SearchService = req.app.state.search_service
     search_service.reset_db()
-    # index_manager의 데이터도 초기화해야 할 수 있지만, 일단 벡터 DB만 초기화합니다.
+    # 파일 지문이 남아 있으면 재인덱싱 시 파일이 건너뛰어지므로 함께 삭제합니다.
+    req.app.state.index_manager.clear_fingerprints()
     return {"message": "ChromaDB collection has been reset."}
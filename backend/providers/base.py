@@ -1,8 +1,11 @@
 from abc import ABC, abstractmethod
+import asyncio
 from pydantic import BaseModel
-from typing import List, Optional, AsyncGenerator
+from typing import List, Optional, AsyncGenerator, Callable, Tuple
 from fastapi import UploadFile
 
+BATCH_CONCURRENCY = 8 # 여러 항목을 업로드/삭제할 때 동시에 처리할 최대 요청 수
+
 # 프론트엔드의 FileItem 인터페이스와 일치하는 Pydantic 모델
 # 모든 Provider는 이 형식에 맞춰 파일 정보를 반환해야 합니다.
 class FileItem(BaseModel):
@@ -25,6 +28,7 @@ class FileSystemProvider(ABC):
     async def list_files(self, path: str) -> List[FileItem]:
         """
         지정된 경로의 파일 및 디렉터리 목록을 비동기적으로 반환합니다.
+        루트 경로('/' 또는 '.')에서는 Provider의 최상위 항목(예: 공유 폴더)을 반환해야 합니다.
 
         :param path: 조회할 경로
         :return: FileItem 모델의 리스트
@@ -45,10 +49,27 @@ class FileSystemProvider(ABC):
         """
         pass
     
+    async def iter_text(self, path: str, block_size: int = 1024 * 1024) -> AsyncGenerator[str, None]:
+        """
+        지정된 텍스트 파일의 내용을 블록 단위로 반환합니다.
+        기본 구현은 read_file_content 결과 전체를 한 번에 반환하며,
+        스트리밍 읽기를 지원하는 Provider는 이 메서드를 재정의합니다.
+
+        :param path: 읽을 파일의 경로
+        :param block_size: 한 번에 읽을 최대 문자 수
+        """
+        content = await self.read_file_content(path)
+        if content:
+            yield content
+
     @abstractmethod
-    async def list_files_recursive(self, path: str) -> List[FileItem]:
+    async def list_files_recursive(self, path: str, name_filter: Optional[Callable[[str], bool]] = None) -> List[FileItem]:
         """
         지정된 경로의 모든 하위 파일 및 디렉터리 목록을 재귀적으로 반환합니다.
+
+        :param path: 조회할 경로
+        :param name_filter: 지정하면 이름이 조건을 만족하는 파일만 반환합니다 (디렉터리 항목은 제외).
+                            탐색 중에 적용되므로 필요 없는 항목의 메타데이터 조회를 피할 수 있습니다.
         """
         pass
 
@@ -63,6 +84,21 @@ class FileSystemProvider(ABC):
         """
         pass
 
+    async def upload_files(self, uploads: List[Tuple[str, UploadFile]]) -> List[bool]:
+        """
+        여러 파일을 동시에 업로드합니다. (동시 실행 수는 BATCH_CONCURRENCY로 제한)
+
+        :param uploads: (destination_path, file_obj) 튜플의 리스트
+        :return: 각 파일의 업로드 성공 여부 (uploads와 같은 순서)
+        """
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def upload_one(destination_path: str, file_obj: UploadFile) -> bool:
+            async with semaphore:
+                return await self.upload_file(destination_path, file_obj)
+
+        return list(await asyncio.gather(*(upload_one(path, file_obj) for path, file_obj in uploads)))
+
     @abstractmethod
     async def download_file(self, path: str) -> AsyncGenerator[bytes, None]:
         """
@@ -83,3 +119,20 @@ class FileSystemProvider(ABC):
         :return: 삭제 성공 여부.
         """
         pass
+
+    async def delete_items(self, paths: List[str]) -> bool:
+        """
+        여러 파일 또는 디렉터리를 삭제합니다.
+        기본 구현은 delete_item을 동시에 호출하며 (동시 실행 수는 BATCH_CONCURRENCY로 제한),
+        일괄 삭제 API를 지원하는 Provider는 이 메서드를 재정의합니다.
+
+        :param paths: 삭제할 파일 또는 디렉터리 경로의 리스트.
+        :return: 모든 항목의 삭제 성공 여부.
+        """
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def delete_one(path: str) -> bool:
+            async with semaphore:
+                return await self.delete_item(path)
+
+        return all(await asyncio.gather(*(delete_one(path) for path in paths)))
@@ -1,11 +1,16 @@
 import os
-from typing import List, Optional, AsyncGenerator
+import stat
+from typing import List, Optional, AsyncGenerator, Callable, Tuple
 from .base import FileSystemProvider, FileItem
 import asyncio
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 import aiofiles
 from fastapi import UploadFile
 
+# 재귀 탐색에 사용하는 스레드 풀 (NAS 마운트처럼 stat 지연이 큰 환경에서 디렉터리를 병렬로 읽기 위함)
+_SCAN_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="local-scan")
+
 class LocalProvider(FileSystemProvider):
     """
     로컬 파일 시스템을 위한 Provider.
@@ -13,25 +18,32 @@ class LocalProvider(FileSystemProvider):
     """
     def __init__(self, root_dir: str = None, provider_id: Optional[str] = None):
         super().__init__(provider_id)
-        self.root_dir = os.path.abspath(root_dir) if root_dir else os.getcwd()
+        # 루트 경로는 생성 시 한 번만 계산하고, 접두사 검사용 문자열도 미리 만들어 둠
+        self.root_dir = os.path.realpath(root_dir if root_dir else os.getcwd())
+        self._root_prefix = os.path.join(self.root_dir, "")
 
     def _get_full_path(self, path: str) -> str:
         """요청된 상대 경로를 안전한 절대 경로로 변환합니다."""
+        # 빠른 경로: '..'가 없고 join 결과가 루트 아래이면 정규화 생략
+        # (Windows의 'D:file'이나 '\\dir'처럼 isabs가 False여도 join 시 루트를 버리는 경로가 있으므로 접두사는 항상 확인)
+        if '..' not in path:
+            joined = os.path.join(self.root_dir, path)
+            if joined.startswith(self._root_prefix) or joined == self.root_dir:
+                return joined
+
         full_path = os.path.abspath(os.path.join(self.root_dir, path))
-        if not full_path.startswith(self.root_dir):
+        # '/data' 루트가 '/data2' 같은 형제 디렉터리를 허용하지 않도록 구분자까지 비교
+        if full_path != self.root_dir and not full_path.startswith(self._root_prefix):
             raise PermissionError("Access denied: Path is outside the root directory.")
         return full_path
 
     async def list_files(self, path: str) -> List[FileItem]:
         full_path = self._get_full_path(path)
-        if not os.path.exists(full_path) or not os.path.isdir(full_path):
+        if not os.path.isdir(full_path):
             raise FileNotFoundError(f"Directory not found: {path}")
 
-        items = []
-        for item_name in os.listdir(full_path):
-            item_path = os.path.join(full_path, item_name)
-            items.append(self._create_file_item(item_path))
-        return items
+        with os.scandir(full_path) as entries:
+            return [self._create_file_item_from_entry(entry) for entry in entries]
 
     async def get_metadata(self, path: str) -> Optional[FileItem]:
         try:
@@ -48,29 +60,64 @@ class LocalProvider(FileSystemProvider):
             if not os.path.isfile(full_path):
                 return None
             
-            # 비동기적으로 파일 읽기
-            loop = asyncio.get_running_loop()
-            with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = await loop.run_in_executor(None, f.read)
-            return content
+            # 비동기적으로 파일 읽기 (open/read 모두 이벤트 루프를 막지 않음)
+            async with aiofiles.open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
+                return await f.read()
         except Exception:
             return None
 
-    async def list_files_recursive(self, path: str) -> List[FileItem]:
+    async def iter_text(self, path: str, block_size: int = 1024 * 1024) -> AsyncGenerator[str, None]:
+        full_path = self._get_full_path(path)
+        if not os.path.isfile(full_path):
+            return
+
+        # 파일 전체를 메모리에 올리지 않고 block_size 문자씩 읽기
+        async with aiofiles.open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
+            while block := await f.read(block_size):
+                yield block
+
+    async def list_files_recursive(self, path: str, name_filter: Optional[Callable[[str], bool]] = None) -> List[FileItem]:
         full_path = self._get_full_path(path)
         if not os.path.isdir(full_path):
             raise FileNotFoundError(f"Directory not found: {path}")
 
-        items = []
-        for root, dirs, files in os.walk(full_path):
-            for name in files:
-                item_path = os.path.join(root, name)
-                items.append(self._create_file_item(item_path))
-            for name in dirs:
-                item_path = os.path.join(root, name)
-                items.append(self._create_file_item(item_path))
+        # 디렉터리 단위로 scandir를 스레드 풀에 분산하여 한 단계(level)씩 병렬 탐색
+        loop = asyncio.get_running_loop()
+        items: List[FileItem] = []
+        frontier = [full_path]
+        while frontier:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(_SCAN_EXECUTOR, self._scan_directory, dir_path, name_filter)
+                for dir_path in frontier
+            ))
+            frontier = []
+            for subdirs, dir_items in results:
+                frontier.extend(subdirs)
+                items.extend(dir_items)
         return items
 
+    def _scan_directory(self, dir_path: str, name_filter: Optional[Callable[[str], bool]]) -> Tuple[List[str], List[FileItem]]:
+        """
+        디렉터리 하나를 scandir로 읽어 (하위 디렉터리 경로 목록, FileItem 목록)을 반환합니다.
+        스레드 풀에서 실행되며, scandir/stat 시스템 콜 동안 GIL이 해제됩니다.
+        """
+        subdirs: List[str] = []
+        items: List[FileItem] = []
+        try:
+            entries = os.scandir(dir_path)
+        except OSError:
+            return subdirs, items # os.walk와 동일하게 읽을 수 없는 디렉터리는 건너뜀
+        with entries:
+            for entry in entries:
+                is_directory = entry.is_dir()
+                # os.walk와 동일하게 심볼릭 링크 디렉터리는 따라가지 않음
+                if is_directory and not entry.is_symlink():
+                    subdirs.append(entry.path)
+                # 필터가 있으면 조건에 맞는 파일만 stat 하여 추가
+                if name_filter is None or (not is_directory and name_filter(entry.name)):
+                    items.append(self._create_file_item_from_entry(entry))
+        return subdirs, items
+
     async def upload_file(self, destination_path: str, file_obj: UploadFile) -> bool:
         try:
             full_path = self._get_full_path(destination_path)
@@ -110,11 +157,28 @@ class LocalProvider(FileSystemProvider):
 
     def _create_file_item(self, item_path: str) -> FileItem:
         """Helper to create a FileItem from a path."""
-        is_directory = os.path.isdir(item_path)
+        item_path = os.path.normpath(item_path) # _get_full_path의 빠른 경로는 정규화하지 않음 (예: 'root/.')
+        st = os.stat(item_path)
+        is_directory = stat.S_ISDIR(st.st_mode)
         return FileItem(
             name=os.path.basename(item_path),
             is_directory=is_directory,
             path=os.path.relpath(item_path, self.root_dir).replace('\\', '/'),
-            size=os.path.getsize(item_path) if not is_directory else None,
-            last_modified=os.path.getmtime(item_path)
+            size=st.st_size if not is_directory else None,
+            last_modified=st.st_mtime
+        )
+
+    def _create_file_item_from_entry(self, entry: os.DirEntry) -> FileItem:
+        """
+        Helper to create a FileItem from a DirEntry.
+        scandir가 캐시한 정보와 한 번의 stat() 결과를 재사용하여 시스템 콜을 줄입니다.
+        """
+        is_directory = entry.is_dir()
+        st = entry.stat()
+        return FileItem(
+            name=entry.name,
+            is_directory=is_directory,
+            path=os.path.relpath(entry.path, self.root_dir).replace('\\', '/'),
+            size=st.st_size if not is_directory else None,
+            last_modified=st.st_mtime
         )
@@ -1,18 +1,79 @@
 import httpx
+import codecs
+import hashlib
+import hmac
+import importlib.util
+import json
+import logging
 import os
-from typing import List, Optional, AsyncGenerator
+import time
+from pathlib import Path
+from typing import List, Optional, AsyncGenerator, Callable
 from .base import FileSystemProvider, FileItem
 import asyncio
 from fastapi import UploadFile
-import chardet
+
+logger = logging.getLogger(__name__)
+
+# 인코딩 감지기: C 구현(cchardet) > charset_normalizer > 순수 파이썬 chardet 순으로 사용
+try:
+    from cchardet import detect as detect_encoding
+except ImportError:
+    try:
+        from charset_normalizer import detect as detect_encoding
+    except ImportError:
+        from chardet import detect as detect_encoding
+
+# 응답 JSON 파서: C 구현(orjson)이 있으면 사용하고, 없으면 표준 json으로 대체 (둘 다 bytes 입력 가능)
+try:
+    import orjson
+except ImportError:
+    import json as orjson
+
+LIST_CONCURRENCY = 16 # 재귀 탐색 시 동시에 조회할 최대 디렉터리 수
+DETECT_PREFIX_SIZE = 64 * 1024 # 인코딩 감지에 사용할 앞부분 크기
+STREAM_BLOCK_SIZE = 64 * 1024 # 파일 내용을 스트리밍으로 읽을 때의 블록 크기
+UPLOAD_BLOCK_SIZE = 1024 * 1024 # 업로드 시 한 번에 읽어 전송할 블록 크기
+BOM_ENCODINGS = (
+    (b'\xef\xbb\xbf', 'utf-8-sig'),
+    (b'\xff\xfe', 'utf-16'),
+    (b'\xfe\xff', 'utf-16'),
+)
+SESSION_CACHE_TTL = 12 * 60 * 60 # 캐시된 세션을 재사용할 최대 시간 (초)
+SESSION_CACHE_DIR = Path.home() / ".cache" / "filemanager_nas" # 세션 캐시와 설치별 비밀 키를 두는 개인 디렉터리 (0700)
+SESSION_ERROR_CODES = {106, 107, 119} # 세션 만료/중복 로그인/SID 없음
+ERROR_ENVELOPE_MAX_SIZE = 4 * 1024 # 다운로드 JSON 응답을 오류 응답으로 해석해 볼 최대 크기 (이보다 크면 파일 내용으로 스트리밍)
+HTTP_LIMITS = httpx.Limits(max_connections=128, max_keepalive_connections=64)
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None # httpx[http2] 설치 시에만 HTTP/2 사용
+# multipart 헤더의 name/filename 파라미터 이스케이프 규칙 (httpx의 HTML5 form 인코딩과 동일, ESC(0x1B) 제외 제어 문자는 %XX)
+FORM_PARAM_REPLACEMENTS = str.maketrans({
+    '"': "%22", "\\": "\\\\",
+    **{chr(c): f"%{c:02X}" for c in range(0x20) if c != 0x1B},
+})
 
 # Synology API의 응답 형식에 맞춘 Pydantic 모델 (필요에 따라 추가)
 
+def _parse_file_data(file_data: dict, construct: Callable[..., FileItem] = FileItem.model_construct) -> FileItem:
+    """
+    API 응답 데이터를 FileItem 모델로 변환하는 헬퍼 함수.
+    File Station 응답은 형식이 정해져 있으므로 검증 없이 model_construct로 생성합니다.
+    """
+    is_dir = file_data["isdir"]
+    additional = file_data.get("additional") or {}
+
+    return construct(
+        name=file_data["name"],
+        is_directory=is_dir,
+        path=file_data["path"],
+        size=None if is_dir else additional.get("size"),
+        last_modified=(additional.get("time") or {}).get("mtime", 0)
+    )
+
 class SynologyAPIProvider(FileSystemProvider):
     """
     Synology File Station API를 위한 Provider.
     """
-    def __init__(self, host: str, port: str, username: str, password: str, secure: bool = True, provider_id: Optional[str] = None):
+    def __init__(self, host: str, port: str, username: str, password: str, secure: bool = True, provider_id: Optional[str] = None, verify_ssl: bool = True):
         super().__init__(provider_id)
         self.host = host
         self.port = port
@@ -23,13 +84,117 @@ class SynologyAPIProvider(FileSystemProvider):
         self.base_url = f"https://{self.host}:{self.port}/webapi" if self.secure else f"http://{self.host}:{self.port}/webapi"
         self._sid = None # 세션 ID
         self._syno_token = None # CSRF 방지를 위한 Syno Token
-        self.client = httpx.AsyncClient(verify=self.secure) # 비동기 HTTP 클라이언트
+        self._login_lock = asyncio.Lock() # 세션 만료 시 재로그인이 동시에 여러 번 일어나지 않도록 함
+        # 재시작 후에도 로그인을 건너뛸 수 있도록 세션을 개인 디렉터리에 캐시
+        # 파일 이름에는 비밀번호가 들어가지 않으며, 비밀번호 확인은 캐시 내용의 HMAC으로 함
+        account_key = hashlib.sha256(f"{host}:{port}:{username}".encode()).hexdigest()
+        self._session_cache_path = SESSION_CACHE_DIR / f"syno_session_{account_key[:32]}.json"
+        # 비동기 HTTP 클라이언트
+        # 재귀 탐색 등 동시 요청이 많으므로 keep-alive 연결을 넉넉히 유지하여 TCP/TLS 핸드셰이크를 재사용
+        self.client = httpx.AsyncClient(
+            verify=verify_ssl, # 인증서 검증은 secure(https 사용 여부)와 별도로 설정
+            limits=HTTP_LIMITS,
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(30.0, connect=5.0)
+        )
+
+    @staticmethod
+    def _install_secret() -> bytes:
+        """
+        세션 캐시 검증에 쓰는 설치별 비밀 키를 반환합니다. 없으면 새로 만들어 저장합니다.
+        디렉터리는 0700, 키 파일은 0600으로 만들어 소유자만 접근할 수 있게 합니다.
+        """
+        SESSION_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        os.chmod(SESSION_CACHE_DIR, 0o700)
+        secret_path = SESSION_CACHE_DIR / "secret"
+        try:
+            fd = os.open(secret_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            secret = secret_path.read_bytes()
+            if len(secret) != 32:
+                raise OSError(f"Invalid session cache secret: {secret_path}")
+            return secret
+        secret = os.urandom(32)
+        with os.fdopen(fd, "wb") as f:
+            f.write(secret)
+        return secret
+
+    def _credential_digest(self) -> str:
+        """자격 증명의 HMAC을 반환합니다. 비밀 키 없이는 이 값으로 비밀번호를 추측할 수 없습니다."""
+        credentials = f"{self.host}:{self.port}:{self.username}:{self.password}".encode()
+        return hmac.new(self._install_secret(), credentials, hashlib.sha256).hexdigest()
+
+    def _set_session(self, sid: str, syno_token: Optional[str]):
+        """세션 ID와 Syno Token을 설정합니다."""
+        self._sid = sid
+        self._syno_token = syno_token
+        # CSRF 토큰이 있는 경우, 클라이언트의 기본 헤더로 설정
+        if self._syno_token:
+            self.client.headers["X-SYNO-Token"] = self._syno_token
+        else:
+            self.client.headers.pop("X-SYNO-Token", None)
+
+    def _load_cached_session(self) -> bool:
+        """캐시된 세션이 만료되지 않았고 같은 비밀번호로 만든 것이면 사용합니다."""
+        try:
+            with open(self._session_cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached["expires_at"] <= time.time():
+                return False
+            if not hmac.compare_digest(cached["credential"], self._credential_digest()):
+                return False
+            self._set_session(cached["sid"], cached.get("syno_token"))
+            return True
+        except (OSError, RuntimeError, ValueError, KeyError, TypeError):
+            return False
+
+    def _save_session(self):
+        """현재 세션을 소유자만 읽을 수 있는 파일(0600)로 캐시합니다."""
+        try:
+            credential = self._credential_digest()
+            fd = os.open(self._session_cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({
+                    "sid": self._sid,
+                    "syno_token": self._syno_token,
+                    "credential": credential,
+                    "expires_at": time.time() + SESSION_CACHE_TTL
+                }, f)
+        except (OSError, RuntimeError) as e:
+            logger.warning("Could not cache Synology session: %s", e)
+
+    async def _verify_session(self) -> bool:
+        """현재 SID가 아직 유효한지 가벼운 인증 API(File Station 정보 조회)로 확인합니다."""
+        params = {"api": "SYNO.FileStation.Info", "version": "2", "method": "get", "_sid": self._sid}
+        try:
+            response = await self.client.get(f"{self.base_url}/entry.cgi", params=params)
+            response.raise_for_status()
+            return bool(orjson.loads(response.content).get("success"))
+        except (httpx.HTTPError, ValueError, AttributeError):
+            return False
+
+    def _invalidate_session_cache(self):
+        """캐시된 세션 파일을 삭제합니다."""
+        try:
+            os.remove(self._session_cache_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Could not remove cached Synology session: %s", e)
 
-    async def _login(self, otp_code: Optional[str] = None):
+    async def _login(self, otp_code: Optional[str] = None, use_cache: bool = True):
         """
         Synology NAS에 로그인하여 세션 ID (_sid)를 얻습니다.
         2FA를 위해 otp_code를 선택적으로 받습니다.
+        use_cache가 True이면 유효한 캐시 세션이 있을 때 로그인 요청을 생략합니다.
         """
+        # OTP 코드가 주어지면 2단계 인증을 거쳐야 하므로 캐시를 사용하지 않음
+        if use_cache and not otp_code and self._load_cached_session():
+            if await self._verify_session():
+                logger.info("캐시된 Synology 세션을 사용합니다.")
+                return
+            self._invalidate_session_cache()
+
         api_path = "entry.cgi"
         params = {
             "api": "SYNO.API.Auth",
@@ -48,17 +213,17 @@ class SynologyAPIProvider(FileSystemProvider):
             # POST 요청 시에는 파라미터를 'data'로 전달하여 form-encoded body로 보냅니다.
             response = await self.client.post(f"{self.base_url}/{api_path}", data=params)
             response.raise_for_status() # HTTP 오류 발생 시 예외 발생
-            data = response.json()
+            data = orjson.loads(response.content)
 
             if data.get("success"):
-                self._sid = data["data"]["sid"]
-                self._syno_token = data["data"].get("synotoken") # synotoken 가져오기
-                print(f"Synology NAS 로그인 성공. SID: {self._sid}")
-                
-                # CSRF 토큰이 있는 경우, 클라이언트의 기본 헤더로 설정
+                self._set_session(data["data"]["sid"], data["data"].get("synotoken")) # synotoken 가져오기
+                logger.info("Synology NAS 로그인 성공.")
                 if self._syno_token:
-                    self.client.headers["X-SYNO-Token"] = self._syno_token
-                    print(f"Syno-Token 설정 완료.")
+                    logger.info("Syno-Token 설정 완료.")
+                # 2단계 인증으로 얻은 세션은 캐시하지 않음
+                # (캐시하면 비밀번호만으로 OTP 없이 같은 세션을 얻을 수 있게 됨)
+                if not otp_code:
+                    self._save_session()
             else:
                 # API 레벨에서 로그인 실패 처리
                 error_code = data.get("error", {}).get("code")
@@ -66,49 +231,54 @@ class SynologyAPIProvider(FileSystemProvider):
         except httpx.RequestError as e:
             raise ConnectionError(f"Synology NAS에 연결할 수 없습니다: {e}")
 
+    async def _relogin(self, stale_sid: str):
+        """만료된 세션을 버리고 다시 로그인합니다. 다른 요청이 이미 재로그인했다면 생략합니다."""
+        async with self._login_lock:
+            if self._sid != stale_sid:
+                return
+            self._invalidate_session_cache()
+            await self._login(use_cache=False)
+
     async def _api_request(self, api_name: str, method: str, params: dict, version: str = "2", request_method: str = "GET") -> dict:
         """인증된 API 요청을 보내기 위한 헬퍼 함수"""
         if not self._sid:
             raise PermissionError("Not logged in.")
 
         api_path = "entry.cgi"
-        base_params = {
-            "api": api_name,
-            "version": version,
-            "method": method,
-            "_sid": self._sid,
-        }
-        full_params = {**base_params, **params}
-        
-        try:
-            if request_method.upper() == "POST":
-                response = await self.client.post(f"{self.base_url}/{api_path}", data=full_params)
-            else:
-                response = await self.client.get(f"{self.base_url}/{api_path}", params=full_params)
-            
-            response.raise_for_status()
-            data = response.json()
+        # 세션 만료 오류를 받으면 한 번만 재로그인 후 다시 요청
+        for attempt in range(2):
+            sid = self._sid
+            base_params = {
+                "api": api_name,
+                "version": version,
+                "method": method,
+                "_sid": sid,
+            }
+            full_params = {**base_params, **params}
 
-            if not data.get("success"):
-                error_code = data.get("error", {}).get("code")
-                raise PermissionError(f"API 요청 실패 ({api_name}.{method}). 코드: {error_code}")
-            return data
-        except httpx.RequestError as e:
-            raise ConnectionError(f"Synology NAS API 요청 실패: {e}")
+            try:
+                if request_method.upper() == "POST":
+                    response = await self.client.post(f"{self.base_url}/{api_path}", data=full_params)
+                else:
+                    response = await self.client.get(f"{self.base_url}/{api_path}", params=full_params)
 
-    def _parse_file_data(self, file_data: dict) -> FileItem:
-        """API 응답 데이터를 FileItem 모델로 변환하는 헬퍼 함수"""
-        is_dir = file_data["isdir"]
-        additional = file_data.get("additional", {})
-        time_info = additional.get("time", {})
-        
-        return FileItem(
-            name=file_data["name"],
-            is_directory=is_dir,
-            path=file_data["path"],
-            size=additional.get("size") if not is_dir else None,
-            last_modified=time_info.get("mtime", 0)
-        )
+                response.raise_for_status()
+                data = orjson.loads(response.content)
+            except httpx.RequestError as e:
+                raise ConnectionError(f"Synology NAS API 요청 실패: {e}")
+
+            if data.get("success"):
+                return data
+
+            error_code = data.get("error", {}).get("code")
+            if attempt == 0 and error_code in SESSION_ERROR_CODES:
+                logger.info("Synology 세션 만료 (코드: %s). 다시 로그인합니다.", error_code)
+                try:
+                    await self._relogin(sid)
+                except (ConnectionRefusedError, ConnectionError) as e:
+                    raise PermissionError(f"API 요청 실패 ({api_name}.{method}). 코드: {error_code}, 재로그인 실패: {e}")
+                continue
+            raise PermissionError(f"API 요청 실패 ({api_name}.{method}). 코드: {error_code}")
 
     async def list_shares(self) -> List[FileItem]:
         """
@@ -131,17 +301,20 @@ class SynologyAPIProvider(FileSystemProvider):
     async def list_files(self, path: str) -> List[FileItem]:
         """
         지정된 경로의 파일 및 디렉터리 목록을 반환합니다.
+        루트 경로('/' 또는 '.')는 공유 폴더 목록을 반환합니다.
         """
+        if path in ('/', '.'):
+            return await self.list_shares()
+
         params = {
             "folder_path": path,
             "additional": '["real_path","size","owner","time"]'
         }
         data = await self._api_request("SYNO.FileStation.List", "list", params)
         
-        items = []
-        for file_data in data["data"]["files"]:
-            items.append(self._parse_file_data(file_data))
-        return items
+        # 항목이 많은 폴더에서 매번 속성을 조회하지 않도록 model_construct를 지역 변수로 바인딩
+        construct = FileItem.model_construct
+        return [_parse_file_data(file_data, construct) for file_data in data["data"]["files"]]
 
     async def get_metadata(self, path: str) -> Optional[FileItem]:
         """지정된 파일 또는 디렉터리의 메타데이터를 반환합니다."""
@@ -152,75 +325,164 @@ class SynologyAPIProvider(FileSystemProvider):
         try:
             data = await self._api_request("SYNO.FileStation.List", "getinfo", params)
             if data["data"]["files"]:
-                return self._parse_file_data(data["data"]["files"][0])
+                return _parse_file_data(data["data"]["files"][0])
             return None
         except (PermissionError, ConnectionError):
             # 파일이 없거나 권한이 없는 경우 None 반환
             return None
 
-    async def read_file_content(self, path: str) -> Optional[str]:
-        """지정된 텍스트 파일의 내용을 문자열로 반환합니다."""
-        api_path = "entry.cgi"
-        params = {
-            "api": "SYNO.FileStation.Download", "version": "2", "method": "download",
-            "_sid": self._sid, "path": path, "mode": "open"
-        }
+    def _choose_encoding(self, prefix: bytes) -> str:
+        """파일 앞부분 바이트로 디코딩에 사용할 인코딩을 결정합니다."""
+        # BOM이 있으면 인코딩 감지 없이 바로 결정
+        for bom, bom_encoding in BOM_ENCODINGS:
+            if prefix.startswith(bom):
+                return bom_encoding
+
+        # 대부분의 텍스트 파일은 UTF-8(또는 ASCII)이므로, 엄격한 UTF-8 디코딩이 성공하면 감지기를 건너뜀
+        # (앞부분의 끝이 멀티바이트 문자 중간에서 잘릴 수 있으므로 점진적 디코더를 final=False로 사용)
         try:
-            # stream으로 요청하여 대용량 파일에 대비
+            codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+
+        detection = detect_encoding(prefix)
+        detected_encoding = detection['encoding'] if (detection['confidence'] or 0) > 0.7 else None # 70% 이상 신뢰도일 때만 사용
+        if detected_encoding:
+            try:
+                codecs.lookup(detected_encoding)
+                return detected_encoding
+            except LookupError:
+                pass
+        return 'utf-8' # 기본 인코딩
+
+    async def _iter_download(self, path: str, mode: str, block_size: Optional[int] = None) -> AsyncGenerator[bytes, None]:
+        """
+        File Station Download API로 파일을 스트리밍으로 내려받아 바이트 블록을 반환합니다.
+        Synology는 세션 만료 등의 오류를 HTTP 200과 JSON 본문으로 반환하므로, JSON 응답이면
+        오류인지 확인하고 세션 오류(SESSION_ERROR_CODES)이면 _api_request와 같이 한 번 재로그인 후 다시 요청합니다.
+        """
+        api_path = "entry.cgi"
+        for attempt in range(2):
+            sid = self._sid
+            params = {
+                "api": "SYNO.FileStation.Download", "version": "2", "method": "download",
+                "_sid": sid, "path": path, "mode": mode
+            }
             async with self.client.stream("GET", f"{self.base_url}/{api_path}", params=params, timeout=30.0) as response:
                 response.raise_for_status()
-                content_bytes = await response.aread()
-                
-                # chardet을 사용하여 인코딩 감지
-                detection = chardet.detect(content_bytes)
-                detected_encoding = detection['encoding'] if detection['confidence'] > 0.7 else None # 70% 이상 신뢰도일 때만 사용
-
-                # 디코딩 시도 목록
-                encodings_to_try = []
-                if detected_encoding:
-                    encodings_to_try.append(detected_encoding)
-                encodings_to_try.extend(['utf-8', 'euc-kr', 'shift_jis']) # 기본 인코딩 추가
-
-                for encoding in encodings_to_try:
-                    try:
-                        # errors='replace'를 사용하여 깨진 문자를 대체
-                        return content_bytes.decode(encoding, errors='replace')
-                    except UnicodeDecodeError:
-                        continue
-                
-                # 모든 인코딩 실패 시 None 반환
-                print(f"Could not decode file content for {path} with any of the attempted encodings.")
-                return None
+                content_length = response.headers.get("content-length", "")
+                if (not response.headers.get("content-type", "").startswith("application/json")
+                        or (content_length.isdigit() and int(content_length) > ERROR_ENVELOPE_MAX_SIZE)):
+                    async for data in response.aiter_bytes(block_size):
+                        yield data
+                    return
+
+                # JSON 파일 자체일 수도 있으므로, 오류 응답처럼 작은 본문일 때만 파싱해 보고 큰 본문은 그대로 스트리밍
+                blocks = response.aiter_bytes(block_size)
+                head = b""
+                async for data in blocks:
+                    head += data
+                    if len(head) > ERROR_ENVELOPE_MAX_SIZE:
+                        break
+                if len(head) > ERROR_ENVELOPE_MAX_SIZE:
+                    yield head
+                    async for data in blocks:
+                        yield data
+                    return
+
+                try:
+                    data = orjson.loads(head)
+                except ValueError:
+                    data = None
+                if not (isinstance(data, dict) and data.get("success") is False):
+                    if head:
+                        yield head
+                    return
+
+            error_code = (data.get("error") or {}).get("code")
+            if attempt == 0 and error_code in SESSION_ERROR_CODES:
+                logger.info("Synology 세션 만료 (코드: %s). 다시 로그인합니다.", error_code)
+                try:
+                    await self._relogin(sid)
+                except (ConnectionRefusedError, ConnectionError) as e:
+                    raise PermissionError(f"파일 다운로드 실패 ({path}). 코드: {error_code}, 재로그인 실패: {e}")
+                continue
+            raise PermissionError(f"파일 다운로드 실패 ({path}). 코드: {error_code}")
+
+    async def _iter_decoded_text(self, path: str, block_size: int = STREAM_BLOCK_SIZE) -> AsyncGenerator[str, None]:
+        """
+        파일을 스트리밍으로 내려받으면서 점진적으로 디코딩한 텍스트 조각을 반환합니다.
+        인코딩은 앞부분(64KB)으로 한 번만 결정하며, 전체 바이트를 메모리에 올리지 않습니다.
+        """
+        byte_blocks = self._iter_download(path, "open", block_size)
+
+        # 인코딩 감지에 필요한 앞부분만 먼저 모음
+        prefix = bytearray()
+        async for data in byte_blocks:
+            prefix += data
+            if len(prefix) >= DETECT_PREFIX_SIZE:
+                break
+
+        # errors='replace'를 사용하여 깨진 문자를 대체
+        encoding = self._choose_encoding(bytes(prefix[:DETECT_PREFIX_SIZE]))
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        if text := decoder.decode(bytes(prefix)):
+            yield text
+        async for data in byte_blocks:
+            if text := decoder.decode(data):
+                yield text
+        if text := decoder.decode(b'', final=True):
+            yield text
+
+    async def read_file_content(self, path: str) -> Optional[str]:
+        """지정된 텍스트 파일의 내용을 문자열로 반환합니다."""
+        try:
+            return ''.join([text async for text in self._iter_decoded_text(path)])
         except Exception as e:
-            print(f"Error reading file content for {path}: {e}")
+            logger.error("Error reading file content for %s: %s", path, e)
             return None
 
-    async def list_files_recursive(self, path: str) -> List[FileItem]:
-        """지정된 경로의 모든 하위 파일 및 디렉터리 목록을 재귀적으로 반환합니다."""
+    async def iter_text(self, path: str, block_size: int = STREAM_BLOCK_SIZE) -> AsyncGenerator[str, None]:
+        """지정된 텍스트 파일의 내용을 내려받는 대로 디코딩하여 블록 단위로 반환합니다."""
+        async for text in self._iter_decoded_text(path, block_size):
+            yield text
+
+    async def list_files_recursive(self, path: str, name_filter: Optional[Callable[[str], bool]] = None) -> List[FileItem]:
+        """
+        지정된 경로의 모든 하위 파일 및 디렉터리 목록을 재귀적으로 반환합니다.
+        한 단계(level)의 디렉터리들을 동시에 조회하며, 상위 목록의 is_directory를 그대로 사용하여
+        디렉터리마다 getinfo를 다시 호출하지 않습니다.
+        """
+        # 동시에 보내는 API 요청 수 제한 (Synology 세션 한도 보호)
+        semaphore = asyncio.Semaphore(LIST_CONCURRENCY)
+
+        async def list_dir(dir_path: str) -> List[FileItem]:
+            async with semaphore:
+                return await self.list_files(dir_path)
+
         all_items: List[FileItem] = []
-        queue: List[str] = [path]
-        
-        while queue:
-            current_path = queue.pop(0)
-            try:
-                # 현재 경로의 메타데이터를 가져와서 FileItem으로 추가
-                meta = await self.get_metadata(current_path)
-                if meta and meta.path != path: # 최상위 경로는 중복 추가 방지
-                    all_items.append(meta)
-
-                # 현재 경로가 디렉토리일 경우, 하위 목록 조회
-                if meta and meta.is_directory:
-                    items = await self.list_files(current_path)
-                    for item in items:
-                        if item.is_directory:
-                            queue.append(item.path) # 하위 디렉토리는 큐에 추가
-                        else:
-                            all_items.append(item) # 파일은 바로 목록에 추가
-            except PermissionError as e:
-                print(f"권한 오류: {current_path} 폴더를 읽을 수 없습니다. 건너뜁니다. ({e})")
-            except Exception as e:
-                print(f"오류 발생: {current_path} 폴더 처리 중 오류. 건너뜁니다. ({e})")
-        
+        frontier: List[str] = [path]
+
+        while frontier:
+            listings = await asyncio.gather(*(list_dir(p) for p in frontier), return_exceptions=True)
+            next_frontier: List[str] = []
+            for dir_path, listing in zip(frontier, listings):
+                if isinstance(listing, PermissionError):
+                    logger.debug("권한 오류: %s 폴더를 읽을 수 없습니다. 건너뜁니다. (%s)", dir_path, listing)
+                    continue
+                if isinstance(listing, BaseException):
+                    logger.debug("오류 발생: %s 폴더 처리 중 오류. 건너뜁니다. (%s)", dir_path, listing)
+                    continue
+                for item in listing:
+                    if item.is_directory:
+                        next_frontier.append(item.path) # 하위 디렉토리는 다음 단계에서 조회
+                        if name_filter is None:
+                            all_items.append(item)
+                    elif name_filter is None or name_filter(item.name):
+                        all_items.append(item) # 파일은 바로 목록에 추가
+            frontier = next_frontier
+
         return all_items
 
     async def upload_file(self, destination_path: str, file_obj: UploadFile) -> bool:
@@ -233,12 +495,6 @@ class SynologyAPIProvider(FileSystemProvider):
         folder_path = os.path.dirname(destination_path)
         file_name = os.path.basename(destination_path)
 
-        # 파일 내용을 비동기적으로 읽어 httpx.AsyncClient의 'files' 파라미터에 전달
-        # httpx는 'files' 파라미터에 (filename, file_like_object, content_type) 튜플을 기대합니다.
-        files = {
-            "file": (file_name, file_obj.file, file_obj.content_type)
-        }
-
         # API 파라미터
         data = {
             "api": "SYNO.FileStation.Upload",
@@ -250,24 +506,48 @@ class SynologyAPIProvider(FileSystemProvider):
             "create_parents": "true" # 상위 폴더가 없으면 생성
         }
 
+        # multipart/form-data 본문을 직접 구성하여 파일 내용을 블록 단위로 스트리밍 전송
+        # (파일 전체를 메모리에 올리지 않고, 디스크로 넘어간 업로드 파일도 스레드 풀에서 읽음)
+        boundary = os.urandom(16).hex()
+        # 헤더 파라미터(name/filename)는 이스케이프하여 따옴표나 줄바꿈이 헤더를 깨지 않도록 함
+        # 필드 값은 본문에 들어가고 무작위 boundary로만 구분되므로, NAS가 받는 값이 바뀌지 않도록 그대로 전송
+        head = b"".join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name.translate(FORM_PARAM_REPLACEMENTS)}"\r\n\r\n{value}\r\n'.encode()
+            for name, value in data.items()
+        ) + (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{file_name.translate(FORM_PARAM_REPLACEMENTS)}"\r\n'
+            f'Content-Type: {file_obj.content_type or "application/octet-stream"}\r\n\r\n'
+        ).encode()
+        tail = f'\r\n--{boundary}--\r\n'.encode()
+
+        async def multipart_body():
+            yield head
+            await file_obj.seek(0) # 이전에 읽은 적이 있어도 처음부터 전송
+            while block := await file_obj.read(UPLOAD_BLOCK_SIZE):
+                yield block
+            yield tail
+
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        if file_obj.size is not None:
+            headers["Content-Length"] = str(len(head) + file_obj.size + len(tail))
+
         try:
-            # httpx는 'data'와 'files'를 함께 사용하여 multipart/form-data 요청을 자동으로 구성합니다.
-            response = await self.client.post(f"{self.base_url}/{api_path}", data=data, files=files, timeout=60.0)
+            response = await self.client.post(f"{self.base_url}/{api_path}", content=multipart_body(), headers=headers, timeout=60.0)
             response.raise_for_status()
-            result = response.json()
+            result = orjson.loads(response.content)
 
             if result.get("success"):
-                print(f"File '{file_name}' uploaded successfully to '{folder_path}'.")
+                logger.info("File '%s' uploaded successfully to '%s'.", file_name, folder_path)
                 return True
             else:
                 error_code = result.get("error", {}).get("code")
-                print(f"Synology upload failed for '{file_name}'. Error code: {error_code}")
+                logger.error("Synology upload failed for '%s'. Error code: %s", file_name, error_code)
                 return False
         except httpx.RequestError as e:
-            print(f"Synology upload request failed for '{file_name}': {e}")
+            logger.error("Synology upload request failed for '%s': %s", file_name, e)
             return False
         except Exception as e:
-            print(f"An unexpected error occurred during Synology upload for '{file_name}': {e}")
+            logger.error("An unexpected error occurred during Synology upload for '%s': %s", file_name, e)
             return False
 
     async def download_file(self, path: str) -> AsyncGenerator[bytes, None]:
@@ -275,28 +555,29 @@ class SynologyAPIProvider(FileSystemProvider):
         Synology NAS에서 파일을 비동기적으로 다운로드합니다.
         파일 내용을 바이트 스트림으로 반환합니다.
         """
-        api_path = "entry.cgi"
-        params = {
-            "api": "SYNO.FileStation.Download", "version": "2", "method": "download",
-            "_sid": self._sid, "path": path, "mode": "download" # mode를 'download'로 설정
-        }
         try:
-            async with self.client.stream("GET", f"{self.base_url}/{api_path}", params=params, timeout=30.0) as response:
-                response.raise_for_status()
-                async for chunk in response.aiter_bytes():
-                    yield chunk
+            async for chunk in self._iter_download(path, "download"): # mode를 'download'로 설정
+                yield chunk
         except Exception as e:
-            print(f"Error downloading file from Synology NAS {path}: {e}")
+            logger.error("Error downloading file from Synology NAS %s: %s", path, e)
             raise # Re-raise the exception to be handled by the caller
 
     async def delete_item(self, path: str) -> bool:
         """
         Synology NAS에서 파일 또는 폴더를 삭제합니다.
         """
+        return await self.delete_items([path])
+
+    async def delete_items(self, paths: List[str]) -> bool:
+        """
+        Synology NAS에서 여러 파일 또는 폴더를 한 번의 API 요청으로 삭제합니다.
+        """
+        if not paths:
+            return True
         try:
-            # Synology API는 여러 경로를 배열로 받을 수 있지만, 여기서는 단일 경로만 처리합니다.
+            # Synology API는 여러 경로를 JSON 배열로 받으므로 N개의 삭제를 한 번의 요청으로 처리
             params = {
-                "path": f'["{path}"]', # JSON 배열 형식으로 전달
+                "path": json.dumps(paths), # JSON 배열 형식으로 전달
                 "force_delete": "true" # 휴지통을 거치지 않고 강제 삭제
             }
             data = await self._api_request("SYNO.FileStation.Delete", "delete", params, request_method="POST")
@@ -304,14 +585,14 @@ class SynologyAPIProvider(FileSystemProvider):
             if data.get("success"):
                 # Synology API의 delete 응답은 성공 시 data 필드가 비어있거나
                 # task_id를 포함할 수 있습니다. 여기서는 단순히 success 여부만 확인합니다.
-                print(f"Item '{path}' deleted successfully from Synology NAS.")
+                logger.info("Items %s deleted successfully from Synology NAS.", paths)
                 return True
             else:
                 error_code = data.get("error", {}).get("code")
-                print(f"Synology delete failed for '{path}'. Error code: {error_code}")
+                logger.error("Synology delete failed for %s. Error code: %s", paths, error_code)
                 return False
         except Exception as e:
-            print(f"Error deleting item from Synology NAS {path}: {e}")
+            logger.error("Error deleting items from Synology NAS %s: %s", paths, e)
             return False
 
     async def close(self):
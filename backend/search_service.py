@@ -1,8 +1,104 @@
 import os
-from typing import List, Dict, Any
+import asyncio
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional
 from chromadb import Client, Settings
 from chromadb.utils import embedding_functions
 from sentence_transformers import SentenceTransformer, CrossEncoder # Added CrossEncoder
+import torch
+
+# ONNX Runtime이 설치되어 있으면 CPU에서 int8 양자화된 Re-ranker를 사용 (없으면 PyTorch CrossEncoder 사용)
+try:
+    import numpy as np
+    import onnxruntime
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+RERANKER_MODEL_NAME = 'Dongjin-kr/ko-reranker'
+RERANKER_ONNX_DIR = './onnx_models/ko-reranker' # 변환/양자화한 Re-ranker를 저장할 경로
+RERANKER_MAX_LENGTH = 256 # Re-ranker 입력의 최대 토큰 수
+RERANKER_SNIPPET_CHARS = 512 # Re-ranker에 전달할 문서 조각의 최대 문자 수 (RERANKER_MAX_LENGTH 토큰에 맞춤)
+SEARCH_CACHE_SIZE = 256 # 캐시할 최대 검색 결과 수
+QUERY_EMBEDDING_CACHE_SIZE = 1024 # 캐시할 최대 쿼리 임베딩 수 (임베딩 하나는 약 1.5KB)
+INDEX_SUB_BATCH_SIZE = 256 # ChromaDB에 한 번에 저장할 최대 청크 수
+EMBEDDING_BATCH_SIZE = 64 # 임베딩 모델의 배치 크기
+
+def _folder_levels(file_path: str) -> Dict[str, str]:
+    """
+    파일의 상위 폴더 경로를 깊이별 메타데이터로 만듭니다.
+    예: '/share/docs/a.txt' -> {'folder_l1': '/share', 'folder_l2': '/share/docs'}
+    """
+    head, _, _ = file_path.rpartition('/')
+    parts = head.split('/')
+    levels = {}
+    depth = 0
+    for i, part in enumerate(parts):
+        if part:
+            depth += 1
+            levels[f"folder_l{depth}"] = '/'.join(parts[:i + 1])
+    return levels
+
+class OnnxReranker:
+    """
+    ONNX Runtime으로 실행하는 int8 양자화 Re-ranker.
+    CrossEncoder.predict와 같은 방식으로 호출할 수 있습니다.
+    """
+    def __init__(self, model_name: str, cache_dir: str):
+        cache_path = Path(cache_dir)
+        model_path = cache_path / 'model.onnx'
+        quantized_path = cache_path / 'model_int8.onnx'
+        # 최초 1회만 ONNX로 변환한 뒤 가중치를 int8로 동적 양자화하여 저장
+        # (양자화 전에 중단되었더라도 이미 변환된 model.onnx는 다시 변환하지 않음)
+        if not model_path.exists():
+            logger.info("Exporting re-ranker '%s' to ONNX at %s...", model_name, cache_path)
+            ORTModelForSequenceClassification.from_pretrained(model_name, export=True).save_pretrained(cache_path)
+        if not (cache_path / 'tokenizer_config.json').exists():
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(cache_path)
+        if not quantized_path.exists():
+            logger.info("Quantizing re-ranker ONNX model to int8 at %s...", quantized_path)
+            quantize_dynamic(str(model_path), str(quantized_path), weight_type=QuantType.QInt8)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(cache_path)
+        self.session = onnxruntime.InferenceSession(str(quantized_path), providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def predict(self, sentence_pairs: List[List[str]], batch_size: int = 32) -> List[float]:
+        scores: List[float] = []
+        for i in range(0, len(sentence_pairs), batch_size):
+            batch = sentence_pairs[i:i + batch_size]
+            features = self.tokenizer(
+                [pair[0] for pair in batch], [pair[1] for pair in batch],
+                padding=True, truncation=True, max_length=RERANKER_MAX_LENGTH, return_tensors='np'
+            )
+            logits = self.session.run(None, {name: value for name, value in features.items() if name in self.input_names})[0]
+            # CrossEncoder(num_labels=1)와 같은 점수 범위가 되도록 sigmoid 적용
+            scores.extend((1 / (1 + np.exp(-logits[:, 0]))).tolist())
+        return scores
+
+def _load_reranker(device: str):
+    """
+    Re-ranker를 로드합니다.
+    CPU에서는 가능하면 int8 ONNX 모델을, GPU에서는 FP16 CrossEncoder를 사용합니다.
+    """
+    if device == 'cpu' and ONNX_AVAILABLE:
+        try:
+            return OnnxReranker(RERANKER_MODEL_NAME, RERANKER_ONNX_DIR)
+        except Exception as e:
+            logger.warning("Failed to load ONNX re-ranker, falling back to CrossEncoder: %s", e)
+
+    re_ranker = CrossEncoder(RERANKER_MODEL_NAME, device=device, max_length=RERANKER_MAX_LENGTH)
+    if device == 'cuda':
+        re_ranker.model.half()
+    return re_ranker
 
 class SearchService:
     def __init__(self, db_path: str = "./chroma_db"):
@@ -13,20 +109,68 @@ class SearchService:
             is_persistent=True
         ))
         
+        # GPU를 사용할 수 있으면 모델을 GPU에 올림
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
         # SentenceTransformer 모델 로드
-        self.embedding_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=self.device)
+
+        # ChromaDB의 임베딩 함수는 모델 이름별로 인스턴스를 캐시하므로,
+        # 이미 로드한 모델을 등록해 두어 같은 모델을 두 번 로드하지 않도록 합니다.
+        embedding_functions.SentenceTransformerEmbeddingFunction.models[EMBEDDING_MODEL_NAME] = self.embedding_model
+        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=EMBEDDING_MODEL_NAME, device=self.device)
         
         # Re-ranker 모델 로드 (한국어 모델)
-        self.re_ranker = CrossEncoder('Dongjin-kr/ko-reranker') # Load Korean re-ranker
+        self.re_ranker = _load_reranker(self.device) # Load Korean re-ranker
         
         # ChromaDB 컬렉션 생성 또는 가져오기
         # embedding_function을 SentenceTransformer 모델로 설정합니다.
         self.collection = self.client.get_or_create_collection(
             name="file_contents",
-            embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(model_name='paraphrase-multilingual-MiniLM-L12-v2')
+            embedding_function=self.embedding_function
         )
-        print(f"ChromaDB initialized at {db_path} with collection 'file_contents'")
-        print(f"Re-ranker model 'Dongjin-kr/ko-reranker' loaded.")
+        # 컬렉션 내용이 바뀔 때마다 증가하는 버전과, 파일 경로 -> 청크 ID 목록 캐시
+        self._version = 0
+        self._path_cache: Optional[Dict[str, List[str]]] = None
+        # (query, n_results, _version) -> 검색 결과, query -> 쿼리 임베딩 (LRU)
+        self._search_cache: OrderedDict = OrderedDict()
+        self._query_embedding_cache: OrderedDict = OrderedDict()
+        logger.info("ChromaDB initialized at %s with collection 'file_contents'", db_path)
+        logger.info("Re-ranker model '%s' loaded on %s (%s).", RERANKER_MODEL_NAME, self.device, type(self.re_ranker).__name__)
+
+    def _invalidate_cache(self):
+        """컬렉션이 변경되었을 때 호출하여 캐시를 무효화합니다."""
+        self._version += 1
+        self._path_cache = None
+        self._search_cache.clear() # 쿼리 임베딩은 컬렉션 내용과 무관하므로 유지
+
+    def _get_path_cache(self) -> Dict[str, List[str]]:
+        """파일 경로별 청크 ID 목록을 반환합니다. 컬렉션이 바뀌지 않았다면 캐시를 사용합니다."""
+        if self._path_cache is not None:
+            return self._path_cache
+
+        # ID는 항상 함께 반환되므로 metadatas만 포함하여 컬렉션을 한 번만 조회
+        path_cache: Dict[str, List[str]] = {}
+        results = self.collection.get(include=['metadatas'])
+        if results['metadatas']:
+            for doc_id, metadata in zip(results['ids'], results['metadatas']):
+                if metadata and 'file_path' in metadata:
+                    path_cache.setdefault(metadata['file_path'], []).append(doc_id)
+        self._path_cache = path_cache
+        return path_cache
+
+    def _embed_query(self, query: str) -> List[float]:
+        """쿼리 임베딩을 계산합니다. 같은 쿼리는 LRU 캐시에서 재사용합니다."""
+        embedding = self._query_embedding_cache.get(query)
+        if embedding is not None:
+            self._query_embedding_cache.move_to_end(query)
+            return embedding
+
+        embedding = self.embedding_function([query])[0]
+        self._query_embedding_cache[query] = embedding
+        if len(self._query_embedding_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+            self._query_embedding_cache.popitem(last=False)
+        return embedding
 
     async def index_chunks(self, documents: List[str], metadatas: List[Dict], ids: List[str]):
         """
@@ -35,17 +179,60 @@ class SearchService:
         if not documents:
             return
         
-        self.collection.add(
+        # 폴더 단위 삭제를 ChromaDB의 where 필터로 처리할 수 있도록 상위 폴더 경로를 메타데이터에 추가
+        metadatas = [{**metadata, **_folder_levels(metadata.get('file_path', ''))} for metadata in metadatas]
+
+        # 임베딩 계산과 저장은 CPU/디스크 작업이므로 워커 스레드에서 실행하여 이벤트 루프를 막지 않음
+        # 한 번에 저장하는 양을 제한하여 메모리 사용량과 SQLite 잠금 시간을 줄임
+        for i in range(0, len(documents), INDEX_SUB_BATCH_SIZE):
+            await asyncio.to_thread(
+                self._embed_and_upsert,
+                documents[i:i + INDEX_SUB_BATCH_SIZE],
+                metadatas[i:i + INDEX_SUB_BATCH_SIZE],
+                ids[i:i + INDEX_SUB_BATCH_SIZE]
+            )
+            self._invalidate_cache()
+        logger.info("Indexed %d chunks.", len(documents))
+
+    def _embed_and_upsert(self, documents: List[str], metadatas: List[Dict], ids: List[str]):
+        """
+        청크를 한 번에 임베딩한 뒤 ChromaDB에 저장합니다.
+        내용이 바뀌어 다시 인덱싱되는 파일은 청크 ID가 같으므로 add 대신 upsert로 덮어씁니다.
+        """
+        # 컬렉션의 임베딩 함수와 같은 설정(정규화 없음)으로 인코딩
+        embeddings = self.embedding_model.encode(
+            documents,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=False
+        )
+        self.collection.upsert(
             documents=documents,
+            embeddings=embeddings,
             metadatas=metadatas,
             ids=ids
         )
-        print(f"Indexed {len(documents)} chunks.")
 
     async def search(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]: # Keep n_results default as 5 here, it's overridden by main.py
         """
         쿼리를 기반으로 ChromaDB에서 유사한 파일을 검색하고, 재순위 지정을 통해 결과의 정확도를 높입니다.
+        컬렉션이 바뀌지 않았다면 같은 검색 요청의 결과를 LRU 캐시에서 반환합니다.
         """
+        cache_key = (query, n_results, self._version)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            self._search_cache.move_to_end(cache_key)
+            return list(cached)
+
+        final_results = self._search_uncached(query, n_results)
+        self._search_cache[cache_key] = final_results
+        if len(self._search_cache) > SEARCH_CACHE_SIZE:
+            self._search_cache.popitem(last=False)
+        return list(final_results)
+
+    def _search_uncached(self, query: str, n_results: int) -> List[Dict[str, Any]]:
+        """캐시를 거치지 않고 벡터 검색과 재순위 지정을 수행합니다."""
         item_count = self.collection.count()
         if item_count == 0:
             return []
@@ -55,7 +242,7 @@ class SearchService:
         candidate_n_results = min(n_results * 2, 20, item_count) # Changed to retrieve more candidates for re-ranking
 
         results = self.collection.query(
-            query_texts=[query],
+            query_embeddings=[self._embed_query(query)],
             n_results=candidate_n_results,
             include=['documents', 'metadatas', 'distances']
         )
@@ -75,11 +262,17 @@ class SearchService:
         if not parsed_results:
             return []
 
+        # 후보가 n_results개 이하이면 재순위 지정으로 반환되는 결과 집합이 바뀌지 않으므로,
+        # Re-ranker를 건너뛰고 벡터 거리 순서 그대로 반환합니다.
+        if len(parsed_results) <= n_results:
+            return self._dedup_by_file(parsed_results, n_results)
+
         # Re-ranker는 (query, document) 쌍의 리스트를 받습니다.
-        reranker_input = [[query, res['content_snippet']] for res in parsed_results]
+        # 어텐션 비용은 입력 길이의 제곱에 비례하므로, 어차피 잘릴 긴 조각은 미리 잘라서 전달합니다.
+        reranker_input = [[query, res['content_snippet'][:RERANKER_SNIPPET_CHARS]] for res in parsed_results]
         
         # Re-ranker 모델을 사용하여 점수 예측
-        reranker_scores = self.re_ranker.predict(reranker_input)
+        reranker_scores = self.re_ranker.predict(reranker_input, batch_size=32)
 
         # 원본 결과에 재순위 점수 추가
         for i, score in enumerate(reranker_scores):
@@ -89,9 +282,14 @@ class SearchService:
         parsed_results.sort(key=lambda x: x['reranker_score'], reverse=True)
 
         # 파일 경로 기준으로 중복을 제거하여 다양한 파일의 결과를 반환 (재순위 지정 후)
+        return self._dedup_by_file(parsed_results, n_results)
+
+    @staticmethod
+    def _dedup_by_file(results: List[Dict[str, Any]], n_results: int) -> List[Dict[str, Any]]:
+        """파일 경로 기준으로 중복을 제거하고, 순서를 유지한 채 최대 n_results개를 반환합니다."""
         final_results = []
         seen_files = set()
-        for result in parsed_results:
+        for result in results:
             if len(final_results) >= n_results:
                 break
             if result['file_path'] not in seen_files:
@@ -104,18 +302,7 @@ class SearchService:
         """
         현재 ChromaDB에 인덱싱된 파일 경로 목록을 반환합니다.
         """
-        all_ids = self.collection.get(include=[])['ids']
-        if not all_ids:
-            return []
-
-        results = self.collection.get(ids=all_ids, include=['metadatas'])
-        
-        unique_paths = set()
-        if results['metadatas']:
-            for metadata in results['metadatas']:
-                if metadata and 'file_path' in metadata:
-                    unique_paths.add(metadata['file_path'])
-        return list(unique_paths)
+        return list(self._get_path_cache())
 
     def delete_indexed_file(self, file_path: str):
         """
@@ -124,23 +311,47 @@ class SearchService:
         # 이 메서드는 이제 청크 기반 삭제가 필요하므로 delete_files_in_folder를 사용해야 합니다.
         self.delete_files_in_folder(file_path)
 
+    async def delete_chunks(self, ids: List[str]):
+        """
+        지정한 ID의 청크를 삭제합니다.
+        내용이 바뀐 파일을 다시 인덱싱했을 때 이전보다 많았던 청크를 정리하는 데 사용합니다.
+        """
+        if not ids:
+            return
+        await asyncio.to_thread(self.collection.delete, ids=ids)
+        self._invalidate_cache()
+        logger.info("Deleted %d stale chunks.", len(ids))
+
     async def delete_files_in_folder(self, folder_path: str) -> int:
         """
         ChromaDB에서 특정 폴더 경로 하위의 모든 파일 인덱스를 삭제합니다.
         """
-        # ChromaDB는 metadata 필드에 대한 "starts with" 필터링을 직접 지원하지 않습니다.
-        # 따라서 모든 ID를 가져와서 애플리케이션 레벨에서 필터링합니다.
-        all_ids = self.collection.get(include=[])['ids']
-        
-        ids_to_delete = [
-            doc_id for doc_id in all_ids if doc_id.startswith(folder_path)
-        ]
+        # 인덱싱 시 저장한 상위 폴더 메타데이터(folder_l{깊이})로 ChromaDB에서 직접 필터링합니다.
+        ids_to_delete: List[str] = []
+        folder = folder_path.rstrip('/')
+        depth = len([part for part in folder.split('/') if part])
+        if depth and folder != '.':
+            ids_to_delete = self.collection.get(where={f"folder_l{depth}": folder}, include=[])['ids']
+
+        # 폴더 메타데이터가 없는 이전 인덱스(또는 루트 경로)는
+        # 캐시된 파일 경로 목록에서 애플리케이션 레벨로 필터링합니다. (청크 단위가 아닌 파일 단위 순회)
+        # 경로 구분자까지 비교하여 '/s/docs' 삭제 시 '/s/docs2' 같은 형제 폴더가 함께 삭제되지 않도록 함
+        if not ids_to_delete:
+            is_root = folder in ('', '.')
+            folder_prefix = folder + '/'
+            ids_to_delete = [
+                doc_id
+                for file_path, doc_ids in self._get_path_cache().items()
+                if is_root or file_path == folder or file_path.startswith(folder_prefix)
+                for doc_id in doc_ids
+            ]
         
         if not ids_to_delete:
             return 0
             
         self.collection.delete(ids=ids_to_delete)
-        print(f"Deleted {len(ids_to_delete)} files from folder {folder_path}")
+        self._invalidate_cache()
+        logger.info("Deleted %d files from folder %s", len(ids_to_delete), folder_path)
         return len(ids_to_delete)
 
     def reset_db(self):
@@ -150,13 +361,14 @@ class SearchService:
         self.client.delete_collection(name="file_contents")
         self.collection = self.client.get_or_create_collection(
             name="file_contents",
-            embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(model_name='paraphrase-multilingual-MiniLM-L12-v2')
+            embedding_function=self.embedding_function
         )
-        print("ChromaDB reset.")
+        self._invalidate_cache()
+        logger.info("ChromaDB reset.")
 
     def __del__(self):
         # 애플리케이션 종료 시 ChromaDB 클라이언트가 데이터를 디스크에 저장하도록 합니다.
         # is_persistent=True 설정으로 자동 저장되므로 명시적 호출은 필요하지 않을 수 있습니다.
         if self.client:
             # self.client.persist() # Removed as it might not be needed with is_persistent=True
-            print("ChromaDB client initialized with persistence.")
+            logger.info("ChromaDB client initialized with persistence.")
@@ -0,0 +1,59 @@
+import asyncio
+import hashlib
+import random
+
+import pytest
+
+from backend.main import chunk_text, iter_text_chunks
+
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta"]
+BLOCK_SIZES = [1000, 5000, 64 * 1024, 1024 * 1024]
+
+
+class BlockProvider:
+    """텍스트를 block_size 문자씩 나누어 반환하는 테스트용 Provider"""
+    def __init__(self, text: str, block_size: int):
+        self.text = text
+        self.block_size = block_size
+
+    async def iter_text(self, path: str):
+        for i in range(0, len(self.text), self.block_size):
+            yield self.text[i:i + self.block_size]
+
+
+def stream_chunks(text: str, block_size: int):
+    hasher = hashlib.sha256()
+
+    async def collect():
+        return [chunk async for chunk in iter_text_chunks(BlockProvider(text, block_size), "file.txt", hasher)]
+
+    return asyncio.run(collect()), hasher.hexdigest()
+
+
+def make_text(separators, count: int = 30000, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(count):
+        parts.append(rng.choice(WORDS))
+        parts.append(rng.choices([sep for sep, _ in separators], weights=[weight for _, weight in separators])[0])
+    return "".join(parts)
+
+
+@pytest.mark.parametrize("block_size", BLOCK_SIZES)
+def test_streamed_chunks_match_whole_text(block_size):
+    text = make_text([(" ", 1)])
+    chunks, digest = stream_chunks(text, block_size)
+    assert chunks == chunk_text(text)
+    assert digest == hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@pytest.mark.parametrize("block_size", BLOCK_SIZES)
+def test_streamed_chunks_do_not_join_words_across_blocks(block_size):
+    text = make_text([(" ", 90), ("\n", 8), ("\n\n", 2)], seed=1)
+    chunks, _ = stream_chunks(text, block_size)
+    words = set(WORDS)
+    for chunk in chunks:
+        assert chunk in text
+        assert set(chunk.split()) <= words
+    if block_size >= len(text):
+        assert chunks == chunk_text(text)